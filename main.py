@@ -1,9 +1,17 @@
 import os
+import re
+import asyncio
+import copy
+import shutil
+import itertools
 import logging
-import json
+import orjson
+import msgspec
 import discord
 import datetime
 import traceback
+from functools import lru_cache
+from typing import Optional, List
 from discord import app_commands
 from discord.ext import commands
 from discord import ui
@@ -20,8 +28,16 @@ logging.basicConfig(
 
 load_dotenv()
 TOKEN = os.getenv('DISCORD_TOKEN')
-CONFIG_FILE = 'config.json'
+CONFIG_DIR = 'config'
+# Tickets, reaction roles and bot status; everything keyed by guild lives in CONFIG_DIR/<guild_id>.json
+GLOBAL_CONFIG_FILE = os.path.join(CONFIG_DIR, 'global.json')
+# Single-file config used before it was split per guild, migrated on startup
+LEGACY_CONFIG_FILE = 'config.json'
 INVITES_FILE = 'invites_data.json'
+# Top-level keys that mark a payload as a single embed rather than a message with 'embeds'
+_EMBED_KEYS = frozenset(('title', 'description', 'fields', 'color'))
+# Six-digit RRGGBB hex colours, with or without a leading '#'
+_HEX_RE = re.compile(r'#?[0-9a-fA-F]{6}')
 
 intents = discord.Intents.default()
 intents.message_content = True
@@ -29,67 +45,336 @@ intents.members = True
 intents.reactions = True
 intents.invites = True
 
+# Parsed JSON files keyed by filename: {'mtime': st_mtime_ns, 'data': dict, 'version': int}
+_JSON_CACHE = {}
+# Bumped every time a cached file's data is replaced, so derived caches can tell it changed
+_JSON_VERSIONS = itertools.count(1)
+# Cached guild configs keyed by int guild id; values are the same dicts as in _JSON_CACHE
+_CONFIG_BY_INT = {}
+# Theme primary colour keyed by int guild id, for guilds that have one set
+_THEME_PRIMARY = {}
+
+class EmbedField(msgspec.Struct, omit_defaults=True):
+    """A single embed field."""
+    name: str
+    value: str
+    inline: Optional[bool] = None
+
+class EmbedFooter(msgspec.Struct, omit_defaults=True):
+    """Embed footer."""
+    text: str
+    icon_url: Optional[str] = None
+
+class EmbedAuthor(msgspec.Struct, omit_defaults=True):
+    """Embed author."""
+    name: str
+    url: Optional[str] = None
+    icon_url: Optional[str] = None
+
+class EmbedData(msgspec.Struct, omit_defaults=True):
+    """One embed, either inside 'embeds' or as the top level of a single-embed payload."""
+    title: Optional[str] = None
+    description: Optional[str] = None
+    url: Optional[str] = None
+    timestamp: Optional[datetime.datetime] = None
+    color: Optional[int] = None
+    fields: Optional[List[EmbedField]] = None
+    footer: Optional[EmbedFooter] = None
+    image: Optional[dict] = None
+    thumbnail: Optional[dict] = None
+    author: Optional[EmbedAuthor] = None
+
+class EmbedPayload(EmbedData, omit_defaults=True):
+    """Message payload accepted by /embed, /welcome and /ticketpanel, validated while it is decoded."""
+    content: Optional[str] = None
+    embeds: Optional[List[EmbedData]] = None
+
+def payload_to_dict(payload):
+    """Converts a decoded EmbedPayload back into the plain dict shape Embed.from_dict and the config expect."""
+    data = msgspec.to_builtins(payload)
+    # msgspec writes UTC as 'Z', which datetime.fromisoformat (used by Embed.from_dict) only accepts from Python 3.11
+    for embed in [data, *data.get('embeds', [])]:
+        timestamp = embed.get('timestamp')
+        if timestamp and timestamp.endswith('Z'):
+            embed['timestamp'] = timestamp[:-1] + '+00:00'
+    return data
+
+class GuildState:
+    """Welcome message templates resolved from one version of a guild's config."""
+    __slots__ = ('content', 'embeds', 'has_placeholders')
+
+    def __init__(self, content, embeds, has_placeholders):
+        self.content = content
+        self.embeds = embeds
+        self.has_placeholders = has_placeholders
+
 def load_json(filename):
-    """Safely loads JSON, returning empty dict on failure."""
-    if not os.path.exists(filename):
+    """Safely loads JSON, returning empty dict on failure. Re-reads only when the file's mtime changes."""
+    try:
+        mtime = os.stat(filename).st_mtime_ns
+    except FileNotFoundError:
+        _drop_json(filename)
         return {}
+    except OSError as e:
+        logging.error(f"Error loading {filename}: {e}. Returning empty dict.")
+        return {}
+
+    cached = _JSON_CACHE.get(filename)
+    if cached and cached['mtime'] == mtime:
+        return cached['data']
+
     try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (json.JSONDecodeError, OSError) as e:
+        with open(filename, 'rb') as f:
+            # Take the mtime from the open file so it matches the bytes read even if the file was just replaced
+            mtime = os.fstat(f.fileno()).st_mtime_ns
+            data = orjson.loads(f.read())
+    except FileNotFoundError:
+        _drop_json(filename)
+        return {}
+    except (orjson.JSONDecodeError, OSError) as e:
         logging.error(f"Error loading {filename}: {e}. Returning empty dict.")
         return {}
 
+    _cache_json(filename, mtime, data)
+    return data
+
+def _cache_json(filename, mtime, data):
+    """Stores parsed data for a file, keeping the int-keyed guild views in sync."""
+    _JSON_CACHE[filename] = {'mtime': mtime, 'data': data, 'version': next(_JSON_VERSIONS)}
+    guild_id = _guild_id_for(filename)
+    if guild_id is not None:
+        _CONFIG_BY_INT[guild_id] = data
+        theme = data.get('theme')
+        primary = theme.get('primary') if isinstance(theme, dict) else None
+        if primary:
+            _THEME_PRIMARY[guild_id] = primary
+        else:
+            _THEME_PRIMARY.pop(guild_id, None)
+
+def _drop_json(filename):
+    """Forgets the cached data for a file."""
+    _JSON_CACHE.pop(filename, None)
+    guild_id = _guild_id_for(filename)
+    if guild_id is not None:
+        _CONFIG_BY_INT.pop(guild_id, None)
+        _THEME_PRIMARY.pop(guild_id, None)
+
+def guild_config_path(guild_id):
+    """Returns the config file for a guild."""
+    return os.path.join(CONFIG_DIR, f"{guild_id}.json")
+
+def _guild_id_for(filename):
+    """Returns the int guild id a config file belongs to, or None for other files."""
+    head, name = os.path.split(filename)
+    stem = name[:-5] if name.endswith('.json') else ''
+    return int(stem) if head == CONFIG_DIR and stem.isdigit() else None
+
+def load_guild_config(guild_id):
+    """Loads a guild's config for editing, returning empty dict if it has none yet."""
+    return load_json(guild_config_path(guild_id))
+
+def save_guild_config(guild_id, data):
+    """Saves a guild's config, touching no other guild's file. Returns True on success."""
+    return save_json(guild_config_path(guild_id), data)
+
+def get_guild_config(guild_id):
+    """Returns the config for an int guild id, or None if the guild is not configured."""
+    load_guild_config(guild_id)
+    return _CONFIG_BY_INT.get(guild_id)
+
+def load_all_guild_configs():
+    """Loads every guild config into the cache so unconfigured guilds can be skipped without touching disk."""
+    try:
+        entries = list(os.scandir(CONFIG_DIR))
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        guild_id = _guild_id_for(os.path.join(CONFIG_DIR, entry.name))
+        if guild_id is not None:
+            load_guild_config(guild_id)
+
+def migrate_legacy_config():
+    """Splits a single-file config.json into per-guild files under CONFIG_DIR. Returns False if migration failed."""
+    if os.path.isdir(CONFIG_DIR) or not os.path.exists(LEGACY_CONFIG_FILE):
+        return True
+
+    try:
+        with open(LEGACY_CONFIG_FILE, 'rb') as f:
+            legacy = orjson.loads(f.read())
+        if not isinstance(legacy, dict):
+            raise ValueError("top level is not an object")
+    except (orjson.JSONDecodeError, ValueError, OSError) as e:
+        logging.error(f"Cannot migrate {LEGACY_CONFIG_FILE}: {e}. Leaving it in place.")
+        return False
+
+    # Build the shards in a staging folder and rename it into place, so a failure never leaves a partial config/
+    staging = f"{CONFIG_DIR}.tmp.{os.getpid()}"
+    try:
+        os.makedirs(staging, exist_ok=True)
+        global_data = {}
+        for key, value in legacy.items():
+            if key.isdigit():
+                if not save_json(os.path.join(staging, f"{key}.json"), value):
+                    raise OSError(f"could not write config for guild {key}")
+            else:
+                global_data[key] = value
+        if not save_json(os.path.join(staging, os.path.basename(GLOBAL_CONFIG_FILE)), global_data):
+            raise OSError("could not write global config")
+        os.rename(staging, CONFIG_DIR)
+    except OSError as e:
+        logging.error(f"Cannot migrate {LEGACY_CONFIG_FILE}: {e}. Leaving it in place.")
+        shutil.rmtree(staging, ignore_errors=True)
+        return False
+    finally:
+        # The staging paths are gone either way; don't keep them in the cache
+        for name in [n for n in _JSON_CACHE if os.path.dirname(n) == staging]:
+            _JSON_CACHE.pop(name, None)
+
+    os.replace(LEGACY_CONFIG_FILE, f"{LEGACY_CONFIG_FILE}.bak")
+    logging.info(f"Migrated {LEGACY_CONFIG_FILE} into {CONFIG_DIR}/ (old file kept as {LEGACY_CONFIG_FILE}.bak)")
+    return True
+
+def json_version(filename):
+    """Returns the version of the cached data for a file, or None if it is not cached."""
+    cached = _JSON_CACHE.get(filename)
+    return cached['version'] if cached else None
+
 def save_json(filename, data):
-    """Safely saves JSON with error handling."""
+    """Safely saves JSON atomically with error handling and refreshes the cached copy. Returns True on success."""
+    buf = orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    tmp = f"{filename}.tmp.{os.getpid()}"
     try:
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=4)
+        with open(tmp, 'wb') as f:
+            f.write(buf)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, filename)
+        _cache_json(filename, os.stat(filename).st_mtime_ns, data)
+        return True
     except OSError as e:
+        # Discard the unsaved changes and re-read what is actually on disk, so a guild
+        # with a valid older file stays registered for the on_member_join fast path
+        _drop_json(filename)
+        load_json(filename)
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
         logging.error(f"Error saving {filename}: {e}")
+        return False
 
-def replace_placeholders(obj, member):
-    """Recursively replaces placeholders safely."""
-    if not member: 
-        return obj
-    try:
-        if isinstance(obj, str):
-            u_mention = member.mention if hasattr(member, 'mention') else "Unknown"
-            u_name = member.name if hasattr(member, 'name') else "Unknown"
-            return obj.replace("{user}", u_mention).replace("{username}", u_name)
-        elif isinstance(obj, list):
-            return [replace_placeholders(item, member) for item in obj]
-        elif isinstance(obj, dict):
-            return {k: replace_placeholders(v, member) for k, v in obj.items()}
-    except Exception as e:
-        logging.error(f"Placeholder error: {e}")
-    return obj
+_PLACEHOLDER_RE = re.compile(r'\{(user|username)\}')
+
+def _fill(text, user_mention, username):
+    """Replaces placeholders in a single string; anything that is not a string is returned untouched."""
+    if not isinstance(text, str) or '{' not in text:
+        return text
+    return _PLACEHOLDER_RE.sub(lambda m: user_mention if m.group(1) == 'user' else username, text)
+
+def _apply_placeholders_inplace(embed, user_mention, username):
+    """Fills placeholders on a copied template Embed, touching only the text parts of an embed."""
+    embed.title = _fill(embed.title, user_mention, username)
+    embed.description = _fill(embed.description, user_mention, username)
+
+    # A shallow copy shares the template's footer/author/field dicts; the setters build new ones
+    footer = embed.footer
+    if footer.text:
+        embed.set_footer(text=_fill(footer.text, user_mention, username), icon_url=footer.icon_url)
+
+    author = embed.author
+    if author.name:
+        embed.set_author(name=_fill(author.name, user_mention, username), url=author.url, icon_url=author.icon_url)
+
+    fields = getattr(embed, '_fields', None)
+    if fields:
+        embed._fields = [
+            {**f, 'name': _fill(f.get('name'), user_mention, username), 'value': _fill(f.get('value'), user_mention, username)}
+            for f in fields
+        ]
 
 def apply_theme(data, guild_id):
-    """Injects theme safely."""
-    try:
-        config = load_json(CONFIG_FILE)
-        if guild_id not in config or 'theme' not in config[guild_id]:
-            return data
-
-        primary_color = config[guild_id]['theme'].get('primary')
-        if not primary_color:
-            return data
+    """Injects the guild's saved theme safely."""
+    load_guild_config(guild_id)
+    return _inject_theme(data, _THEME_PRIMARY.get(guild_id))
 
-        def set_color(embed_dict):
-            if isinstance(embed_dict, dict) and 'color' not in embed_dict:
-                embed_dict['color'] = primary_color
-            return embed_dict
+def _inject_theme(data, primary_color):
+    """Sets primary_color in place on embeds that have no color of their own. Never pass cached config data."""
+    if primary_color is None:
+        return data
 
+    try:
         if 'embeds' in data and isinstance(data['embeds'], list):
-            data['embeds'] = [set_color(e) for e in data['embeds']]
-        elif any(k in data for k in ('title', 'description', 'fields')):
-            data = set_color(data)
+            for e in data['embeds']:
+                if isinstance(e, dict) and 'color' not in e:
+                    e['color'] = primary_color
+        elif not _EMBED_KEYS.isdisjoint(data) and 'color' not in data:
+            data['color'] = primary_color
     except Exception as e:
         logging.error(f"Theme application error: {e}")
         
     return data
 
+def _prepare_embed(raw, primary_color):
+    """Copies a message payload in one walk while spotting placeholders, then colours it like _inject_theme.
+
+    Returns (payload, has_placeholders). The copy is safe to store or mutate; raw is left untouched.
+    """
+    has_placeholders = False
+
+    def copy_node(obj):
+        nonlocal has_placeholders
+        if isinstance(obj, str):
+            if not has_placeholders and ('{user}' in obj or '{username}' in obj):
+                has_placeholders = True
+            return obj
+        if isinstance(obj, list):
+            return [copy_node(item) for item in obj]
+        if isinstance(obj, dict):
+            return {k: copy_node(v) for k, v in obj.items()}
+        return obj
+
+    # Colouring only looks at the top level and the 'embeds' list, so it is not a second walk
+    return _inject_theme(copy_node(raw), primary_color), has_placeholders
+
+def _materialize(settings):
+    """Stores the welcome payload with the guild theme applied under '_resolved_embed_data'."""
+    if not settings.get('embed_data'):
+        settings.pop('_resolved_embed_data', None)
+        settings.pop('_resolved_has_placeholders', None)
+        return
+    primary_color = (settings.get('theme') or {}).get('primary') or None
+    resolved, has_placeholders = _prepare_embed(settings['embed_data'], primary_color)
+    settings['_resolved_embed_data'] = resolved
+    settings['_resolved_has_placeholders'] = has_placeholders
+
+def build_welcome_embeds(guild_id, settings):
+    """Parses a guild's welcome payload into Embed templates."""
+    data = settings.get('_resolved_embed_data')
+    has_placeholders = settings.get('_resolved_has_placeholders')
+    if data is None or has_placeholders is None:
+        # Configs saved before the payload was resolved at write time
+        data, has_placeholders = _prepare_embed(settings['embed_data'], _THEME_PRIMARY.get(guild_id))
+    embeds = []
+    if 'embeds' in data:
+        embeds = [discord.Embed.from_dict(e) for e in data['embeds'][:10]]
+    elif not _EMBED_KEYS.isdisjoint(data):
+        embeds = [discord.Embed.from_dict(data)]
+
+    return GuildState(data.get('content'), embeds, has_placeholders)
+
+@lru_cache(maxsize=1024)
+def _resolve_guild_state(guild_id, version):
+    """Builds the welcome templates for one version of a guild's config; a new version misses the cache."""
+    return build_welcome_embeds(guild_id, _CONFIG_BY_INT[guild_id])
+
+def get_welcome_state(guild_id):
+    """Returns the welcome templates for a guild's current config, or None if it has no loaded welcome message."""
+    settings = _CONFIG_BY_INT.get(guild_id)
+    version = json_version(guild_config_path(guild_id))
+    if not settings or version is None or not settings.get('embed_data'):
+        return None
+    return _resolve_guild_state(guild_id, version)
+
 def is_staff(interaction: discord.Interaction):
     """Checks staff permissions safely."""
     if not interaction.guild:
@@ -99,10 +384,9 @@ def is_staff(interaction: discord.Interaction):
         return True
     
     try:
-        config = load_json(CONFIG_FILE)
-        guild_id = str(interaction.guild_id)
-        if guild_id in config and 'ticket_staff' in config[guild_id]:
-            staff_roles = config[guild_id]['ticket_staff']
+        settings = get_guild_config(interaction.guild_id)
+        if settings and 'ticket_staff' in settings:
+            staff_roles = settings['ticket_staff']
             user_role_ids = [r.id for r in interaction.user.roles]
             if any(sid in user_role_ids for sid in staff_roles):
                 return True
@@ -244,9 +528,9 @@ class TicketView(ui.View):
         try:
             await interaction.response.defer(ephemeral=True)
             
-            config = load_json(CONFIG_FILE)
+            config = load_json(GLOBAL_CONFIG_FILE)
             message_id = str(interaction.message.id)
-            guild_id = str(interaction.guild_id)
+            settings = get_guild_config(interaction.guild_id)
             
             tickets_config = config.get('tickets', {})
             category_id = tickets_config.get(message_id)
@@ -266,8 +550,8 @@ class TicketView(ui.View):
                 interaction.user: discord.PermissionOverwrite(read_messages=True, send_messages=True)
             }
 
-            if guild_id in config and 'ticket_staff' in config[guild_id]:
-                for role_id in config[guild_id]['ticket_staff']:
+            if settings and 'ticket_staff' in settings:
+                for role_id in settings['ticket_staff']:
                     role = interaction.guild.get_role(role_id)
                     if role:
                         overrides[role] = discord.PermissionOverwrite(read_messages=True, send_messages=True)
@@ -344,7 +628,7 @@ async def on_ready():
     logging.info(f'Logged in as {bot.user} (ID: {bot.user.id})')
     
     try:
-        config = load_json(CONFIG_FILE)
+        config = load_json(GLOBAL_CONFIG_FILE)
         
         if 'bot_status' in config:
             status_data = config['bot_status']
@@ -355,9 +639,9 @@ async def on_ready():
         await bot.cache_invites()
         
         for guild in bot.guilds:
-            guild_id = str(guild.id)
-            if guild_id in config and config[guild_id].get('role_id'):
-                role_id = config[guild_id]['role_id']
+            settings = get_guild_config(guild.id)
+            if settings and settings.get('role_id'):
+                role_id = settings['role_id']
                 role = guild.get_role(role_id)
                 
                 if role:
@@ -389,39 +673,48 @@ async def on_invite_delete(invite):
 
 @bot.event
 async def on_member_join(member):
+    # Every config file is cached at startup and on save, so a miss means the guild has nothing configured
+    if member.guild.id not in _CONFIG_BY_INT:
+        return
+
     try:
-        config = load_json(CONFIG_FILE)
+        settings = get_guild_config(member.guild.id)
         invites_data = load_json(INVITES_FILE)
         guild_id = str(member.guild.id)
         
-        if guild_id in config:
-            settings = config[guild_id]
+        if settings:
+            # Role assignment and the welcome message are independent requests, so send them together
+            jobs = []
             if settings.get('role_id'):
                 role = member.guild.get_role(settings['role_id'])
                 if role:
-                    try:
-                        await member.add_roles(role)
-                    except discord.Forbidden:
-                        logging.error(f"Cannot assign welcome role in {member.guild.id}")
+                    jobs.append((member.add_roles(role), f"Cannot assign welcome role in {member.guild.id}"))
 
             if settings.get('channel_id') and settings.get('embed_data'):
                 channel = member.guild.get_channel(settings['channel_id'])
                 if channel:
                     try:
-                        raw_data = settings['embed_data']
-                        data = apply_theme(raw_data, guild_id)
-                        data = replace_placeholders(data, member)
-                        content = data.get('content')
-                        embeds = []
-                        if 'embeds' in data:
-                            embeds = [discord.Embed.from_dict(e) for e in data['embeds']]
-                        elif any(k in data for k in ('title', 'description', 'fields', 'color')):
-                            embeds = [discord.Embed.from_dict(data)]
-                        await channel.send(content=content, embeds=embeds[:10])
+                        state = get_welcome_state(member.guild.id)
+                        if state is None:
+                            logging.error(f"Failed to send welcome message: no welcome config loaded for guild {member.guild.id}")
+                        else:
+                            content, embeds = state.content, state.embeds
+                            if state.has_placeholders:
+                                user_mention, username = member.mention, member.name
+                                content = _fill(content, user_mention, username)
+                                embeds = [copy.copy(e) for e in embeds]
+                                for embed in embeds:
+                                    _apply_placeholders_inplace(embed, user_mention, username)
+                            jobs.append((channel.send(content=content, embeds=embeds), "Failed to send welcome message"))
                     except Exception as e:
                         logging.error(f"Failed to send welcome message: {e}")
 
-        track_channel_id = config.get(guild_id, {}).get('invite_log_channel')
+            results = await asyncio.gather(*(job for job, _ in jobs), return_exceptions=True)
+            for (_, error_message), result in zip(jobs, results):
+                if isinstance(result, Exception):
+                    logging.error(f"{error_message}: {result}")
+
+        track_channel_id = settings.get('invite_log_channel') if settings else None
         inviter = None
         
         if track_channel_id:
@@ -469,7 +762,7 @@ async def on_member_join(member):
                             ],
                             "footer": {"text": f"Account Created: {member.created_at.strftime('%Y-%m-%d %H:%M:%S')}"}
                         }
-                        embed_data = apply_theme(embed_data, guild_id)
+                        embed_data = _inject_theme(embed_data, _THEME_PRIMARY.get(member.guild.id))
                         await channel.send(embed=discord.Embed.from_dict(embed_data))
                         
             except discord.Forbidden:
@@ -482,11 +775,11 @@ async def on_member_join(member):
 @bot.event
 async def on_member_remove(member):
     try:
-        config = load_json(CONFIG_FILE)
+        settings = get_guild_config(member.guild.id)
         invites_data = load_json(INVITES_FILE)
         guild_id = str(member.guild.id)
         
-        track_channel_id = config.get(guild_id, {}).get('invite_log_channel')
+        track_channel_id = settings.get('invite_log_channel') if settings else None
         
         if track_channel_id and guild_id in invites_data:
             member_id = str(member.id)
@@ -512,7 +805,7 @@ async def on_member_remove(member):
                                 {"name": "Left", "value": str(left), "inline": True}
                             ]
                         }
-                        embed_data = apply_theme(embed_data, guild_id)
+                        embed_data = _inject_theme(embed_data, _THEME_PRIMARY.get(member.guild.id))
                         await channel.send(embed=discord.Embed.from_dict(embed_data))
     except Exception as e:
         logging.error(f"on_member_remove error: {e}")
@@ -523,7 +816,7 @@ async def on_raw_reaction_add(payload):
         return
 
     try:
-        config = load_json(CONFIG_FILE)
+        config = load_json(GLOBAL_CONFIG_FILE)
         message_id = str(payload.message_id)
         
         if 'reaction_roles' in config and message_id in config['reaction_roles']:
@@ -548,7 +841,7 @@ async def on_raw_reaction_add(payload):
 @bot.event
 async def on_raw_reaction_remove(payload):
     try:
-        config = load_json(CONFIG_FILE)
+        config = load_json(GLOBAL_CONFIG_FILE)
         message_id = str(payload.message_id)
         
         if 'reaction_roles' in config and message_id in config['reaction_roles']:
@@ -576,20 +869,15 @@ async def on_raw_reaction_remove(payload):
 @app_commands.guild_only()
 async def theme_command(interaction: discord.Interaction, primary: str, secondary: str = None):
     try:
-        p_int = int(primary.strip('#'), 16)
-        s_int = int(secondary.strip('#'), 16) if secondary else None
+        if not _HEX_RE.fullmatch(primary) or (secondary and not _HEX_RE.fullmatch(secondary)):
+            raise ValueError("Expected a 6-digit hex color")
+        p_int = int(primary.lstrip('#'), 16)
+        s_int = int(secondary.lstrip('#'), 16) if secondary else None
         
-        config = load_json(CONFIG_FILE)
-        guild_id = str(interaction.guild_id)
-        
-        if guild_id not in config:
-            config[guild_id] = {}
-        
-        if 'theme' not in config[guild_id]:
-             config[guild_id]['theme'] = {}
-
-        config[guild_id]['theme'] = {'primary': p_int, 'secondary': s_int}
-        save_json(CONFIG_FILE, config)
+        settings = load_guild_config(interaction.guild_id)
+        settings['theme'] = {'primary': p_int, 'secondary': s_int}
+        _materialize(settings)
+        save_guild_config(interaction.guild_id, settings)
         
         embed = discord.Embed(title="Theme Updated", description=f"Primary set to {primary}", color=p_int)
         if s_int: embed.add_field(name="Secondary", value=secondary)
@@ -606,14 +894,14 @@ async def theme_command(interaction: discord.Interaction, primary: str, secondar
 @app_commands.guild_only()
 async def embed_command(interaction: discord.Interaction, embed_json: str):
     try:
-        data = json.loads(embed_json)
-        data = apply_theme(data, str(interaction.guild_id))
+        payload = msgspec.json.decode(embed_json, type=EmbedPayload)
+        data = apply_theme(payload_to_dict(payload), interaction.guild_id)
 
-        content = data.get('content')
+        content = payload.content
         embeds = []
         if 'embeds' in data:
-            embeds = [discord.Embed.from_dict(e) for e in data['embeds']]
-        elif any(k in data for k in ('title', 'description', 'fields', 'color')):
+            embeds = [discord.Embed.from_dict(e) for e in data['embeds'][:10]]
+        elif not _EMBED_KEYS.isdisjoint(data):
             embeds = [discord.Embed.from_dict(data)]
 
         if not content and not embeds:
@@ -621,8 +909,10 @@ async def embed_command(interaction: discord.Interaction, embed_json: str):
             return
 
         await interaction.response.send_message("Embed posted successfully.", ephemeral=True)
-        await interaction.channel.send(content=content, embeds=embeds[:10])
-    except json.JSONDecodeError:
+        await interaction.channel.send(content=content, embeds=embeds)
+    except msgspec.ValidationError as e:
+        await interaction.response.send_message(f"Error: Invalid message payload: {e}", ephemeral=True)
+    except msgspec.DecodeError:
         await interaction.response.send_message("Error: Invalid JSON format.", ephemeral=True)
     except Exception as e:
         logging.error(f"Embed error: {e}")
@@ -634,26 +924,35 @@ async def embed_command(interaction: discord.Interaction, embed_json: str):
 @app_commands.guild_only()
 async def welcome_command(interaction: discord.Interaction, channel: discord.TextChannel, embed_json: str, role: discord.Role = None):
     try:
-        data = json.loads(embed_json)
-        if not data.get('content') and not data.get('embeds') and not data.get('title'):
+        payload = msgspec.json.decode(embed_json, type=EmbedPayload)
+        if not payload.content and not payload.embeds and not payload.title:
              await interaction.response.send_message("Invalid JSON.", ephemeral=True)
              return
+        data = payload_to_dict(payload)
 
-        config = load_json(CONFIG_FILE)
-        guild_id = str(interaction.guild_id)
-        
-        if guild_id not in config:
-            config[guild_id] = {}
-            
-        config[guild_id].update({
+        # Work on a copy so a payload that fails to build leaves the cached config untouched
+        settings = {
+            **load_guild_config(interaction.guild_id),
             "channel_id": channel.id,
             "embed_data": data,
             "role_id": role.id if role else None
-        })
+        }
+        _materialize(settings)
+
+        try:
+            build_welcome_embeds(interaction.guild_id, settings)
+        except Exception as e:
+            await interaction.response.send_message(f"Error: Could not build the welcome message: {e}", ephemeral=True)
+            return
         
-        save_json(CONFIG_FILE, config)
+        if not save_guild_config(interaction.guild_id, settings):
+            await interaction.response.send_message("Failed to save welcome settings.", ephemeral=True)
+            return
+        get_welcome_state(interaction.guild_id)
         await interaction.response.send_message(f"Welcome message set to {channel.mention}.")
-    except json.JSONDecodeError:
+    except msgspec.ValidationError as e:
+        await interaction.response.send_message(f"Error: Invalid message payload: {e}", ephemeral=True)
+    except msgspec.DecodeError:
         await interaction.response.send_message("Error: Invalid JSON format.", ephemeral=True)
 
 @bot.tree.command(name="poll", description="Create a poll with options separated by |")
@@ -687,7 +986,7 @@ async def poll_command(interaction: discord.Interaction, question: str, options:
             "description": "\n\n".join(description_lines)
         }
         
-        embed_data = apply_theme(embed_data, str(interaction.guild_id))
+        embed_data = apply_theme(embed_data, interaction.guild_id)
         embed = discord.Embed.from_dict(embed_data)
 
         await interaction.response.send_message("Poll created!", ephemeral=True)
@@ -725,7 +1024,7 @@ async def imagepoll_command(interaction: discord.Interaction, question: str, url
         await interaction.response.send_message("Creating image poll...", ephemeral=True)
 
         question_data = {"title": question}
-        question_data = apply_theme(question_data, str(interaction.guild_id))
+        question_data = apply_theme(question_data, interaction.guild_id)
         await interaction.channel.send(embed=discord.Embed.from_dict(question_data))
 
         for i, url in enumerate(url_list):
@@ -733,7 +1032,7 @@ async def imagepoll_command(interaction: discord.Interaction, question: str, url
                 "description": f"Option {emojis[i]}",
                 "image": {"url": url}
             }
-            embed_data = apply_theme(embed_data, str(interaction.guild_id))
+            embed_data = apply_theme(embed_data, interaction.guild_id)
             
             msg = await interaction.channel.send(embed=discord.Embed.from_dict(embed_data))
             await msg.add_reaction(emojis[i])
@@ -762,9 +1061,9 @@ async def status_command(interaction: discord.Interaction, activity: app_command
         act_type = type_map.get(activity.value, discord.ActivityType.playing)
         await bot.change_presence(activity=discord.Activity(type=act_type, name=text))
         
-        config = load_json(CONFIG_FILE)
+        config = load_json(GLOBAL_CONFIG_FILE)
         config['bot_status'] = {'type': activity.value, 'text': text}
-        save_json(CONFIG_FILE, config)
+        save_json(GLOBAL_CONFIG_FILE, config)
         
         await interaction.response.send_message(f"Status updated to: {activity.name} {text}", ephemeral=True)
     except Exception as e:
@@ -793,16 +1092,16 @@ async def ticketpanel_command(interaction: discord.Interaction, channel: discord
             await interaction.response.send_message("Category ID must be a number.", ephemeral=True)
             return
 
-        data = json.loads(embed_json)
-        data = apply_theme(data, str(interaction.guild_id))
+        payload = msgspec.json.decode(embed_json, type=EmbedPayload)
+        data = apply_theme(payload_to_dict(payload), interaction.guild_id)
         
         embeds = []
         if 'embeds' in data:
-            embeds = [discord.Embed.from_dict(e) for e in data['embeds']]
-        elif any(k in data for k in ('title', 'description', 'fields', 'color')):
+            embeds = [discord.Embed.from_dict(e) for e in data['embeds'][:10]]
+        elif not _EMBED_KEYS.isdisjoint(data):
             embeds = [discord.Embed.from_dict(data)]
             
-        content = data.get('content')
+        content = payload.content
 
         if not content and not embeds:
             await interaction.response.send_message("JSON must contain 'content' or 'embeds'.", ephemeral=True)
@@ -823,18 +1122,20 @@ async def ticketpanel_command(interaction: discord.Interaction, channel: discord
         if view.children:
             view.children[0].style = target_style
 
-        message = await channel.send(content=content, embeds=embeds[:10], view=view)
+        message = await channel.send(content=content, embeds=embeds, view=view)
         
-        config = load_json(CONFIG_FILE)
+        config = load_json(GLOBAL_CONFIG_FILE)
         if 'tickets' not in config:
             config['tickets'] = {}
         
         config['tickets'][str(message.id)] = cat_id_int
-        save_json(CONFIG_FILE, config)
+        save_json(GLOBAL_CONFIG_FILE, config)
 
         await interaction.response.send_message(f"Ticket panel created in {channel.mention}", ephemeral=True)
 
-    except json.JSONDecodeError:
+    except msgspec.ValidationError as e:
+        await interaction.response.send_message(f"Error: Invalid message payload: {e}", ephemeral=True)
+    except msgspec.DecodeError:
         await interaction.response.send_message("Error: Invalid JSON format.", ephemeral=True)
     except Exception as e:
         logging.error(f"Ticket panel error: {e}")
@@ -850,21 +1151,16 @@ async def ticketpanel_command(interaction: discord.Interaction, channel: discord
 @app_commands.guild_only()
 async def ticketstaff_command(interaction: discord.Interaction, action: app_commands.Choice[str], role: discord.Role):
     try:
-        config = load_json(CONFIG_FILE)
-        guild_id = str(interaction.guild_id)
-        
-        if guild_id not in config:
-            config[guild_id] = {}
-            
-        if 'ticket_staff' not in config[guild_id]:
-            config[guild_id]['ticket_staff'] = []
+        settings = load_guild_config(interaction.guild_id)
+        if 'ticket_staff' not in settings:
+            settings['ticket_staff'] = []
             
-        staff_list = config[guild_id]['ticket_staff']
+        staff_list = settings['ticket_staff']
         
         if action.value == "add":
             if role.id not in staff_list:
                 staff_list.append(role.id)
-                save_json(CONFIG_FILE, config)
+                save_guild_config(interaction.guild_id, settings)
                 await interaction.response.send_message(f"Role {role.mention} added to Ticket Staff.", ephemeral=True)
             else:
                 await interaction.response.send_message(f"Role {role.mention} is already Ticket Staff.", ephemeral=True)
@@ -872,7 +1168,7 @@ async def ticketstaff_command(interaction: discord.Interaction, action: app_comm
         elif action.value == "remove":
             if role.id in staff_list:
                 staff_list.remove(role.id)
-                save_json(CONFIG_FILE, config)
+                save_guild_config(interaction.guild_id, settings)
                 await interaction.response.send_message(f"Role {role.mention} removed from Ticket Staff.", ephemeral=True)
             else:
                 await interaction.response.send_message(f"Role {role.mention} is not in Ticket Staff list.", ephemeral=True)
@@ -914,7 +1210,7 @@ async def reactionrole_command(interaction: discord.Interaction, question: str,
             "title": question,
             "description": "\n\n".join(description_lines)
         }
-        embed_data = apply_theme(embed_data, str(interaction.guild_id))
+        embed_data = apply_theme(embed_data, interaction.guild_id)
         embed = discord.Embed.from_dict(embed_data)
         
         message = await interaction.channel.send(embed=embed)
@@ -922,12 +1218,12 @@ async def reactionrole_command(interaction: discord.Interaction, question: str,
         for emoji in emojis:
             await message.add_reaction(emoji)
             
-        config = load_json(CONFIG_FILE)
+        config = load_json(GLOBAL_CONFIG_FILE)
         if 'reaction_roles' not in config:
             config['reaction_roles'] = {}
             
         config['reaction_roles'][str(message.id)] = role_map
-        save_json(CONFIG_FILE, config)
+        save_json(GLOBAL_CONFIG_FILE, config)
         
         await interaction.followup.send("Reaction role created!", ephemeral=True)
     except Exception as e:
@@ -940,14 +1236,9 @@ async def reactionrole_command(interaction: discord.Interaction, question: str,
 @app_commands.guild_only()
 async def trackinvites_command(interaction: discord.Interaction, channel: discord.TextChannel):
     try:
-        config = load_json(CONFIG_FILE)
-        guild_id = str(interaction.guild_id)
-        
-        if guild_id not in config:
-            config[guild_id] = {}
-            
-        config[guild_id]['invite_log_channel'] = channel.id
-        save_json(CONFIG_FILE, config)
+        settings = load_guild_config(interaction.guild_id)
+        settings['invite_log_channel'] = channel.id
+        save_guild_config(interaction.guild_id, settings)
         
         await interaction.response.send_message(f"Invite tracking logs will be posted in {channel.mention}.")
     except Exception as e:
@@ -963,8 +1254,6 @@ async def invites_command(interaction: discord.Interaction, user: discord.Member
             user = interaction.user
             
         invites_data = load_json(INVITES_FILE)
-        guild_id = str(interaction.guild_id)
-        
         real, fake, left = calculate_invites(interaction.guild, user.id, invites_data)
 
         embed_data = {
@@ -978,7 +1267,7 @@ async def invites_command(interaction: discord.Interaction, user: discord.Member
             "footer": {"text": f"Account Created: {user.created_at.strftime('%Y-%m-%d %H:%M:%S')}"}
         }
         
-        embed_data = apply_theme(embed_data, guild_id)
+        embed_data = apply_theme(embed_data, interaction.guild_id)
         await interaction.response.send_message(embed=discord.Embed.from_dict(embed_data))
     except Exception as e:
         logging.error(f"Invites check error: {e}")
@@ -989,6 +1278,11 @@ if __name__ == '__main__':
         logging.error("DISCORD_TOKEN not found in .env file")
     else:
         try:
-            bot.run(TOKEN)
+            if not migrate_legacy_config():
+                logging.critical(f"Not starting: {LEGACY_CONFIG_FILE} could not be migrated, see the error above")
+            else:
+                os.makedirs(CONFIG_DIR, exist_ok=True)
+                load_all_guild_configs()
+                bot.run(TOKEN)
         except Exception as e:
             logging.critical(f"Bot execution failed: {e}")
\ No newline at end of file